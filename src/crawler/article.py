@@ -1,12 +1,42 @@
 # Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
-import re
 from urllib.parse import urljoin
 
 from markdownify import markdownify as md
 
 
+def _split_images(markdown: str) -> list[str]:
+    """
+    Split markdown around inline images, the same way as splitting on the
+    pattern `![alt](url)` with a regex that captures the url.
+
+    The result alternates text and image URLs, so odd indexes are URLs. Images
+    never span lines, and once a line has no complete image left the scan
+    jumps to the next line, which keeps the whole split linear.
+    """
+    parts: list[str] = []
+    pos = 0
+    line_end = -1
+    start = markdown.find("![")
+    while start >= 0:
+        if start > line_end:
+            line_end = markdown.find("\n", start)
+            if line_end < 0:
+                line_end = len(markdown)
+        alt_end = markdown.find("](", start + 2, line_end)
+        url_end = markdown.find(")", alt_end + 2, line_end) if alt_end >= 0 else -1
+        if url_end < 0:
+            start = markdown.find("![", line_end)
+            continue
+        parts.append(markdown[pos:start])
+        parts.append(markdown[alt_end + 2 : url_end])
+        pos = url_end + 1
+        start = markdown.find("![", pos)
+    parts.append(markdown[pos:])
+    return parts
+
+
 class Article:
     url: str
 
@@ -22,10 +52,8 @@ class Article:
         return markdown
 
     def to_message(self) -> list[dict]:
-        image_pattern = r"!\[.*?\]\((.*?)\)"
-
         content: list[dict[str, str]] = []
-        parts = re.split(image_pattern, self.to_markdown())
+        parts = _split_images(self.to_markdown())
 
         for i, part in enumerate(parts):
             if i % 2 == 1:
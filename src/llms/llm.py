@@ -24,7 +24,7 @@ def _get_env_llm_conf(llm_type: str) -> Dict[str, Any]:
     conf = {}
     for key, value in os.environ.items():
         if key.startswith(prefix):
-            conf_key = key[len(prefix) :].lower()
+            conf_key = key.removeprefix(prefix).lower()
             conf[conf_key] = value
     return conf
 
@@ -44,8 +44,10 @@ def build_graph():
     return builder.compile()
 
 
+workflow = build_graph()
+
+
 async def _test_workflow():
-    workflow = build_graph()
     events = workflow.astream(
         {
             "content": "The weather in Beijing is sunny",
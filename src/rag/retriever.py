@@ -6,6 +6,9 @@ from pydantic import BaseModel, Field
 
 
 class Chunk:
+    # Retrievers return many chunks per query, so keep them free of a __dict__
+    __slots__ = ("content", "similarity")
+
     content: str
     similarity: float
 
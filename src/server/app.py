@@ -1,24 +1,26 @@
 # Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
+import asyncio
 import base64
-import json
 import logging
 import os
+import time
 from typing import Annotated, List, cast
 from uuid import uuid4
 
+import orjson
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from langchain_core.messages import AIMessageChunk, ToolMessage, BaseMessage
 from langgraph.types import Command
 
 from src.config.tools import SELECTED_RAG_PROVIDER
 from src.graph.builder import build_graph_with_memory
-from src.podcast.graph.builder import build_graph as build_podcast_graph
-from src.ppt.graph.builder import build_graph as build_ppt_graph
-from src.prose.graph.builder import build_graph as build_prose_graph
+from src.podcast.graph.builder import workflow as podcast_graph
+from src.ppt.graph.builder import workflow as ppt_graph
+from src.prose.graph.builder import workflow as prose_graph
 from src.rag.builder import build_retriever
 from src.rag.retriever import Resource
 from src.server.chat_request import (
@@ -44,6 +46,7 @@ app = FastAPI(
     title="DeerFlow API",
     description="API for Deer",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -57,6 +60,29 @@ app.add_middleware(
 
 graph = build_graph_with_memory()
 
+# The framing of every SSE event only depends on its type, so build it once
+_EVENT_PREFIXES = {
+    event_type: f"event: {event_type}\ndata: ".encode()
+    for event_type in (
+        "error",
+        "interrupt",
+        "message_chunk",
+        "tool_calls",
+        "tool_call_chunks",
+        "tool_call_result",
+    )
+}
+# Keep proxies such as nginx from buffering the event stream
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+_INTERRUPT_OPTIONS = [
+    {"text": "Edit plan", "value": "edit_plan"},
+    {"text": "Start research", "value": "accepted"},
+]
+
 
 @app.post("/api/chat/stream")
 async def chat_stream(request: ChatRequest):
@@ -65,7 +91,7 @@ async def chat_stream(request: ChatRequest):
         thread_id = str(uuid4())
     return StreamingResponse(
         _astream_workflow_generator(
-            request.model_dump()["messages"],
+            request.model_dump(include={"messages"})["messages"],
             thread_id,
             request.resources,
             request.max_plan_iterations,
@@ -77,6 +103,7 @@ async def chat_stream(request: ChatRequest):
             request.enable_background_investigation,
         ),
         media_type="text/event-stream",
+        headers=_SSE_HEADERS,
     )
 
 
@@ -107,78 +134,217 @@ async def _astream_workflow_generator(
         if messages:
             resume_msg += f" {messages[-1]['content']}"
         input_ = Command(resume=resume_msg)
-    async for agent, _, event_data in graph.astream(
-        input_,
-        config={
-            "thread_id": thread_id,
-            "resources": resources,
-            "max_plan_iterations": max_plan_iterations,
-            "max_step_num": max_step_num,
-            "max_search_results": max_search_results,
-            "mcp_settings": mcp_settings,
-        },
-        stream_mode=["messages", "updates"],
-        subgraphs=True,
-    ):
-        if isinstance(event_data, dict):
-            if "__interrupt__" in event_data:
-                yield _make_event(
-                    "interrupt",
-                    {
-                        "thread_id": thread_id,
-                        "id": event_data["__interrupt__"][0].ns[0],
-                        "role": "assistant",
-                        "content": event_data["__interrupt__"][0].value,
-                        "finish_reason": "interrupt",
-                        "options": [
-                            {"text": "Edit plan", "value": "edit_plan"},
-                            {"text": "Start research", "value": "accepted"},
-                        ],
-                    },
-                )
-            continue
-        message_chunk, message_metadata = cast(
-            tuple[BaseMessage, dict[str, any]], event_data
+    message_buffer = _MessageChunkBuffer()
+    try:
+        events = graph.astream(
+            input_,
+            config={
+                "thread_id": thread_id,
+                "resources": resources,
+                "max_plan_iterations": max_plan_iterations,
+                "max_step_num": max_step_num,
+                "max_search_results": max_search_results,
+                "mcp_settings": mcp_settings,
+            },
+            stream_mode=["messages", "updates"],
+            subgraphs=True,
         )
-        event_stream_message: dict[str, any] = {
-            "thread_id": thread_id,
-            "agent": agent[0].split(":")[0],
-            "id": message_chunk.id,
-            "role": "assistant",
-            "content": message_chunk.content,
-        }
-        if message_chunk.response_metadata.get("finish_reason"):
-            event_stream_message["finish_reason"] = message_chunk.response_metadata.get(
-                "finish_reason"
+        async for event in _iter_until_deadline(events, message_buffer.timeout):
+            if event is _DEADLINE:
+                # No new event before the buffered tokens were due
+                if frame := message_buffer.flush():
+                    yield frame
+                continue
+            agent, _, event_data = event
+            if isinstance(event_data, dict):
+                if "__interrupt__" in event_data:
+                    if frame := message_buffer.flush():
+                        yield frame
+                    yield _make_event(
+                        "interrupt",
+                        {
+                            "thread_id": thread_id,
+                            "id": event_data["__interrupt__"][0].ns[0],
+                            "role": "assistant",
+                            "content": event_data["__interrupt__"][0].value,
+                            "finish_reason": "interrupt",
+                            "options": _INTERRUPT_OPTIONS,
+                        },
+                    )
+                continue
+            message_chunk, message_metadata = cast(
+                tuple[BaseMessage, dict[str, any]], event_data
             )
-        if isinstance(message_chunk, ToolMessage):
-            # Tool Message - Return the result of the tool call
-            event_stream_message["tool_call_id"] = message_chunk.tool_call_id
-            yield _make_event("tool_call_result", event_stream_message)
-        elif isinstance(message_chunk, AIMessageChunk):
-            # AI Message - Raw message tokens
-            if message_chunk.tool_calls:
-                # AI Message - Tool Call
-                event_stream_message["tool_calls"] = message_chunk.tool_calls
-                event_stream_message["tool_call_chunks"] = (
-                    message_chunk.tool_call_chunks
-                )
-                yield _make_event("tool_calls", event_stream_message)
-            elif message_chunk.tool_call_chunks:
-                # AI Message - Tool Call Chunks
-                event_stream_message["tool_call_chunks"] = (
-                    message_chunk.tool_call_chunks
-                )
-                yield _make_event("tool_call_chunks", event_stream_message)
-            else:
+            event_stream_message: dict[str, any] = {
+                "thread_id": thread_id,
+                "agent": agent[0].partition(":")[0],
+                "id": message_chunk.id,
+                "role": "assistant",
+                "content": message_chunk.content,
+            }
+            if finish_reason := message_chunk.response_metadata.get("finish_reason"):
+                event_stream_message["finish_reason"] = finish_reason
+            if isinstance(message_chunk, ToolMessage):
+                # Tool Message - Return the result of the tool call
+                event_stream_message["tool_call_id"] = message_chunk.tool_call_id
+                event_type = "tool_call_result"
+            elif isinstance(message_chunk, AIMessageChunk):
                 # AI Message - Raw message tokens
-                yield _make_event("message_chunk", event_stream_message)
+                if message_chunk.tool_calls:
+                    # AI Message - Tool Call
+                    event_stream_message["tool_calls"] = message_chunk.tool_calls
+                    event_stream_message["tool_call_chunks"] = (
+                        message_chunk.tool_call_chunks
+                    )
+                    event_type = "tool_calls"
+                elif message_chunk.tool_call_chunks:
+                    # AI Message - Tool Call Chunks
+                    event_stream_message["tool_call_chunks"] = (
+                        message_chunk.tool_call_chunks
+                    )
+                    event_type = "tool_call_chunks"
+                elif not finish_reason and isinstance(message_chunk.content, str):
+                    # AI Message - Raw message tokens, coalesced before sending
+                    for frame in message_buffer.add(event_stream_message):
+                        yield frame
+                    continue
+                else:
+                    # AI Message - Last or non-text tokens, sent as they are
+                    event_type = "message_chunk"
+            else:
+                continue
+            if frame := message_buffer.flush():
+                yield frame
+            yield _make_event(event_type, event_stream_message)
+        if frame := message_buffer.flush():
+            yield frame
+    except Exception as e:
+        # Tell the client why the stream ends instead of just closing it
+        logger.exception(f"Error in chat stream: {str(e)}")
+        if frame := message_buffer.flush():
+            yield frame
+        yield _make_event(
+            "error",
+            {
+                "thread_id": thread_id,
+                "error": {"type": "internal_server_error", "message": str(e)},
+            },
+        )
+
 
+_DEADLINE = object()
 
-def _make_event(event_type: str, data: dict[str, any]):
+
+async def _iter_until_deadline(source, get_timeout):
+    """
+    Iterate an async iterable, yielding _DEADLINE whenever get_timeout()
+    seconds pass without a new item. A None timeout waits indefinitely.
+
+    The pending read is kept across deadlines rather than cancelled, so the
+    source is never interrupted in the middle of producing an item.
+    """
+    iterator = aiter(source)
+    next_item = asyncio.ensure_future(anext(iterator))
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_item}, timeout=get_timeout())
+            if not done:
+                yield _DEADLINE
+                continue
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                return
+            yield item
+            next_item = asyncio.ensure_future(anext(iterator))
+    finally:
+        next_item.cancel()
+
+
+def _make_event(event_type: str, data: dict[str, any]) -> bytes:
     if data.get("content") == "":
         data.pop("content")
-    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return _EVENT_PREFIXES[event_type] + orjson.dumps(data) + b"\n\n"
+
+
+class _MessageChunkBuffer:
+    """
+    Coalesce consecutive tokens of the same message into one message_chunk
+    event, so that tiny LLM deltas do not each cost a frame on the wire.
+
+    A token is sent right away when nothing was flushed for max_delay
+    seconds, otherwise it waits until that deadline, see timeout().
+    """
+
+    def __init__(self, max_size: int = 256, max_delay: float = 0.02):
+        """
+        Args:
+            max_size: Number of buffered characters that forces a flush
+            max_delay: Longest time in seconds a token is held after the
+                previous flush
+        """
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._message: dict[str, any] | None = None
+        self._content: list[str] = []
+        self._size = 0
+        self._last_flush = float("-inf")
+        # Everything but the content is fixed for a message, so its encoded
+        # frame up to the content is reused for every flush of that message
+        self._frame_key: tuple[str, str | None] | None = None
+        self._frame_prefix = b""
+
+    def add(self, message: dict[str, any]) -> list[bytes]:
+        """Buffer a message token and return the frames that are due."""
+        frames = []
+        if self._message is not None and (
+            message["id"] != self._message["id"]
+            or message["agent"] != self._message["agent"]
+        ):
+            frames.append(self.flush())
+        if self._message is None:
+            self._message = message
+        self._content.append(message["content"])
+        self._size += len(message["content"])
+        if (
+            self._size >= self.max_size
+            or time.monotonic() - self._last_flush >= self.max_delay
+        ):
+            frames.append(self.flush())
+        return frames
+
+    def timeout(self) -> float | None:
+        """Return the seconds left until buffered tokens are due, if any."""
+        if self._message is None:
+            return None
+        return max(0.0, self._last_flush + self.max_delay - time.monotonic())
+
+    def flush(self) -> bytes | None:
+        """Return the buffered tokens as a single event, if there are any."""
+        if self._message is None:
+            return None
+        message = self._message
+        content = "".join(self._content)
+        self._message = None
+        self._content = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        if not content:
+            message["content"] = content
+            return _make_event("message_chunk", message)
+        return self._frame_prefix_for(message) + orjson.dumps(content) + b"}\n\n"
+
+    def _frame_prefix_for(self, message: dict[str, any]) -> bytes:
+        key = (message["agent"], message["id"])
+        if key != self._frame_key:
+            header = {k: v for k, v in message.items() if k != "content"}
+            self._frame_key = key
+            self._frame_prefix = (
+                _EVENT_PREFIXES["message_chunk"]
+                + orjson.dumps(header)[:-1]
+                + b',"content":'
+            )
+        return self._frame_prefix
 
 
 @app.post("/api/tts")
@@ -242,8 +408,7 @@ async def generate_podcast(request: GeneratePodcastRequest):
     try:
         report_content = request.content
         print(report_content)
-        workflow = build_podcast_graph()
-        final_state = workflow.invoke({"input": report_content})
+        final_state = podcast_graph.invoke({"input": report_content})
         audio_bytes = final_state["output"]
         return Response(content=audio_bytes, media_type="audio/mp3")
     except Exception as e:
@@ -256,8 +421,7 @@ async def generate_ppt(request: GeneratePPTRequest):
     try:
         report_content = request.content
         print(report_content)
-        workflow = build_ppt_graph()
-        final_state = workflow.invoke({"input": report_content})
+        final_state = ppt_graph.invoke({"input": report_content})
         generated_file_path = final_state["generated_file_path"]
         with open(generated_file_path, "rb") as f:
             ppt_bytes = f.read()
@@ -274,8 +438,7 @@ async def generate_ppt(request: GeneratePPTRequest):
 async def generate_prose(request: GenerateProseRequest):
     try:
         logger.info(f"Generating prose for prompt: {request.prompt}")
-        workflow = build_prose_graph()
-        events = workflow.astream(
+        events = prose_graph.astream(
             {
                 "content": request.prompt,
                 "option": request.option,
@@ -287,6 +450,7 @@ async def generate_prose(request: GenerateProseRequest):
         return StreamingResponse(
             (f"data: {event[0].content}\n\n" async for _, event in events),
             media_type="text/event-stream",
+            headers=_SSE_HEADERS,
         )
     except Exception as e:
         logger.exception(f"Error occurred during prose generation: {str(e)}")
@@ -314,8 +478,8 @@ async def mcp_server_metadata(request: MCPServerMetadataRequest):
             timeout_seconds=timeout,
         )
 
-        # Create the response with tools
-        response = MCPServerMetadataResponse(
+        # Create the response with tools, the fields are already validated
+        response = MCPServerMetadataResponse.model_construct(
             transport=request.transport,
             command=request.command,
             args=request.args,
@@ -335,13 +499,16 @@ async def mcp_server_metadata(request: MCPServerMetadataRequest):
 @app.get("/api/rag/config", response_model=RAGConfigResponse)
 async def rag_config():
     """Get the config of the RAG."""
-    return RAGConfigResponse(provider=SELECTED_RAG_PROVIDER)
+    return RAGConfigResponse.model_construct(provider=SELECTED_RAG_PROVIDER)
 
 
 @app.get("/api/rag/resources", response_model=RAGResourcesResponse)
 async def rag_resources(request: Annotated[RAGResourceRequest, Query()]):
     """Get the resources of the RAG."""
     retriever = build_retriever()
-    if retriever:
-        return RAGResourcesResponse(resources=retriever.list_resources(request.query))
-    return RAGResourcesResponse(resources=[])
+    resources = retriever.list_resources(request.query) if retriever else []
+    response = RAGResourcesResponse.model_construct(resources=resources)
+    # Serialize directly, FastAPI would otherwise re-validate the whole list
+    return Response(
+        content=orjson.dumps(response.model_dump()), media_type="application/json"
+    )
@@ -0,0 +1,264 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import json
+import re
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk, ToolMessage
+
+with patch("src.llms.llm.get_llm_by_type", return_value=MagicMock()):
+    from src.server.app import (
+        _astream_workflow_generator,
+        _make_event,
+        _MessageChunkBuffer,
+        app,
+        graph,
+    )
+
+_SSE_EVENT = re.compile(r"^event: (.+)\ndata: (.+)$", re.M)
+
+
+def parse_sse_events(sse_text: str) -> list[tuple[str, dict]]:
+    """Parse an SSE body into (event type, data) pairs."""
+    return [
+        (match.group(1), json.loads(match.group(2)))
+        for match in _SSE_EVENT.finditer(sse_text)
+    ]
+
+
+def mock_astream(*events):
+    async def astream(*args, **kwargs):
+        for event in events:
+            yield event
+
+    return astream
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_make_event_drops_empty_content():
+    event = _make_event("message_chunk", {"id": "run-1", "content": ""})
+    assert parse_sse_events(event.decode()) == [("message_chunk", {"id": "run-1"})]
+
+
+def test_make_event_keeps_unicode():
+    event = _make_event("message_chunk", {"content": "你好"})
+    assert "你好" in event.decode()
+
+
+def make_message(content, id="run-1", agent="planner"):
+    return {"agent": agent, "id": id, "role": "assistant", "content": content}
+
+
+def test_message_chunk_buffer_sends_first_token_immediately():
+    buffer = _MessageChunkBuffer(max_delay=60)
+    [frame] = buffer.add(make_message("Hel"))
+    assert parse_sse_events(frame.decode())[0][1]["content"] == "Hel"
+    assert buffer.timeout() is None
+
+
+def test_message_chunk_buffer_coalesces_tokens():
+    buffer = _MessageChunkBuffer(max_delay=60)
+    assert len(buffer.add(make_message("Hel"))) == 1
+    for token in ["lo", ", world!"]:
+        assert buffer.add(make_message(token)) == []
+    assert 0 < buffer.timeout() <= 60
+    [(event_type, data)] = parse_sse_events(buffer.flush().decode())
+    assert event_type == "message_chunk"
+    assert data["content"] == "lo, world!"
+    assert buffer.flush() is None
+    assert buffer.timeout() is None
+
+
+def test_message_chunk_buffer_flushes_on_size():
+    buffer = _MessageChunkBuffer(max_size=4, max_delay=60)
+    assert len(buffer.add(make_message("x"))) == 1
+    assert buffer.add(make_message("ab")) == []
+    [frame] = buffer.add(make_message("cd"))
+    assert parse_sse_events(frame.decode())[0][1]["content"] == "abcd"
+
+
+def test_message_chunk_buffer_keeps_messages_apart():
+    buffer = _MessageChunkBuffer(max_delay=60)
+    assert len(buffer.add(make_message("x", id="run-1"))) == 1
+    assert buffer.add(make_message("a", id="run-1")) == []
+    [frame] = buffer.add(make_message("b", id="run-2"))
+    assert parse_sse_events(frame.decode())[0][1]["id"] == "run-1"
+    assert parse_sse_events(buffer.flush().decode())[0][1]["id"] == "run-2"
+
+
+def test_chat_stream_flushes_tokens_while_source_is_idle():
+    async def astream(*args, **kwargs):
+        yield (("planner:1",), None, (AIMessageChunk(content="a", id="run-1"), {}))
+        yield (("planner:1",), None, (AIMessageChunk(content="b", id="run-1"), {}))
+        await asyncio.sleep(0.5)
+        yield (("planner:1",), None, (AIMessageChunk(content="c", id="run-1"), {}))
+
+    async def collect():
+        start = time.monotonic()
+        frames = []
+        generator = _astream_workflow_generator(
+            [], "thread-1", [], 1, 3, 3, True, None, None, False
+        )
+        async for frame in generator:
+            [(_, data)] = parse_sse_events(frame.decode())
+            frames.append((data["content"], time.monotonic() - start))
+        return frames
+
+    with patch.object(graph, "astream", astream):
+        frames = asyncio.run(collect())
+
+    assert [content for content, _ in frames] == ["a", "b", "c"]
+    # The first token is not held behind the second one
+    assert frames[0][1] < 0.2
+    # The buffered token is sent on its deadline, not with the next token
+    assert frames[1][1] < 0.3
+    assert frames[2][1] >= 0.5
+
+
+def test_chat_stream_message_chunks(client):
+    events = mock_astream(
+        (("planner:1",), None, (AIMessageChunk(content="Hello", id="run-1"), {})),
+        (("planner:1",), None, (AIMessageChunk(content=", world!", id="run-1"), {})),
+    )
+    with patch.object(graph, "astream", events):
+        response = client.post("/api/chat/stream", json={"thread_id": "thread-1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    content = ""
+    for event_type, data in parse_sse_events(response.text):
+        assert event_type == "message_chunk"
+        assert data["agent"] == "planner"
+        assert data["thread_id"] == "thread-1"
+        content += data["content"]
+    assert content == "Hello, world!"
+
+
+def test_chat_stream_mixed_events(client):
+    tool_call_chunk = {
+        "name": "web_search",
+        "args": '{"query": "deer"}',
+        "id": "call-1",
+        "index": 0,
+    }
+    events = mock_astream(
+        (("researcher:1",), None, (AIMessageChunk(content="Look", id="run-1"), {})),
+        (
+            ("researcher:1",),
+            None,
+            (
+                AIMessageChunk(
+                    content="", id="run-2", tool_call_chunks=[tool_call_chunk]
+                ),
+                {},
+            ),
+        ),
+        (
+            ("researcher:1",),
+            None,
+            (ToolMessage(content="result", tool_call_id="call-1", id="tool-1"), {}),
+        ),
+        (
+            ("researcher:1",),
+            None,
+            (
+                AIMessageChunk(
+                    content="", id="run-3", response_metadata={"finish_reason": "stop"}
+                ),
+                {},
+            ),
+        ),
+    )
+    with patch.object(graph, "astream", events):
+        response = client.post("/api/chat/stream", json={"thread_id": "thread-1"})
+
+    # Classify every event in a single pass over the stream
+    event_types, contents, finish_reasons = [], [], []
+    tool_calls, tool_results = [], []
+    for event_type, data in parse_sse_events(response.text):
+        event_types.append(event_type)
+        if "content" in data and event_type == "message_chunk":
+            contents.append(data["content"])
+        elif event_type == "tool_calls":
+            tool_calls.extend(data["tool_calls"])
+        elif event_type == "tool_call_result":
+            tool_results.append(data)
+        if "finish_reason" in data:
+            finish_reasons.append(data["finish_reason"])
+
+    assert event_types == [
+        "message_chunk",
+        "tool_calls",
+        "tool_call_result",
+        "message_chunk",
+    ]
+    assert contents == ["Look"]
+    assert [tool_call["name"] for tool_call in tool_calls] == ["web_search"]
+    assert tool_calls[0]["args"] == {"query": "deer"}
+    assert tool_results[0]["tool_call_id"] == "call-1"
+    assert tool_results[0]["content"] == "result"
+    assert finish_reasons == ["stop"]
+
+
+def test_chat_stream_interrupt(client):
+    interrupt = MagicMock(ns=["human_feedback:1"], value="Please Review the Plan.")
+    events = mock_astream((("human_feedback:1",), None, {"__interrupt__": [interrupt]}))
+    with patch.object(graph, "astream", events):
+        response = client.post("/api/chat/stream", json={"thread_id": "thread-1"})
+
+    [(event_type, data)] = parse_sse_events(response.text)
+    assert event_type == "interrupt"
+    assert data["finish_reason"] == "interrupt"
+    assert [option["value"] for option in data["options"]] == [
+        "edit_plan",
+        "accepted",
+    ]
+
+
+def test_chat_stream_error_event(client):
+    async def astream(*args, **kwargs):
+        yield (("planner:1",), None, (AIMessageChunk(content="Hel", id="run-1"), {}))
+        raise RuntimeError("graph failed")
+
+    with patch.object(graph, "astream", astream):
+        response = client.post("/api/chat/stream", json={"thread_id": "thread-1"})
+
+    assert response.status_code == 200
+    [message, error] = parse_sse_events(response.text)
+    assert message[0] == "message_chunk"
+    assert message[1]["content"] == "Hel"
+    assert error[0] == "error"
+    assert error[1]["thread_id"] == "thread-1"
+    assert error[1]["error"] == {
+        "type": "internal_server_error",
+        "message": "graph failed",
+    }
+
+
+def test_message_chunk_buffer_frames_match_make_event():
+    buffer = _MessageChunkBuffer(max_delay=60)
+    for content in ['say "hi"\n', "你好"]:
+        message = make_message(content)
+        [frame] = buffer.add(dict(message)) or [buffer.flush()]
+        assert parse_sse_events(frame.decode()) == parse_sse_events(
+            _make_event("message_chunk", message).decode()
+        )
+
+
+def test_message_chunk_buffer_frames_without_message_id():
+    buffer = _MessageChunkBuffer(max_delay=60)
+    message = make_message("hi", id=None)
+    [frame] = buffer.add(dict(message))
+    assert parse_sse_events(frame.decode()) == parse_sse_events(
+        _make_event("message_chunk", message).decode()
+    )
@@ -1,8 +1,12 @@
 # Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
+import os
+import time
+
 import pytest
-from src.crawler import Crawler
+from src.crawler import Article, Crawler
+from src.crawler.article import _split_images
 
 
 def test_crawler_initialization():
@@ -28,3 +32,66 @@ def test_crawler_markdown_output():
     markdown = result.to_markdown()
     assert isinstance(markdown, str)
     assert len(markdown) > 0
+
+
+def test_article_to_message_without_images():
+    """Test that a large page without images becomes a single text part."""
+    article = Article("Title", "<p>" + "a" * 1_000_000 + "</p>")
+    article.url = "https://example.com/page"
+    message = article.to_message()
+    assert len(message) == 1
+    assert message[0]["type"] == "text"
+    assert message[0]["text"].startswith("# Title")
+    assert message[0]["text"].endswith("a")
+
+
+def test_article_to_message_with_images():
+    """Test that images are split out and resolved against the article URL."""
+    article = Article("Title", '<p>before</p><img src="/img.png" alt="x"><p>after</p>')
+    article.url = "https://example.com/page"
+    message = article.to_message()
+    assert [part["type"] for part in message] == ["text", "image_url", "text"]
+    assert message[1]["image_url"]["url"] == "https://example.com/img.png"
+    assert message[2]["text"] == "after"
+
+
+def test_article_to_message_with_unterminated_image():
+    """Test that image markup broken across lines is kept as text."""
+    article = Article("Title", "<p>![alt](http://example.com/a.png</p><p>)</p>")
+    article.url = "https://example.com/page"
+    message = article.to_message()
+    assert len(message) == 1
+    assert message[0]["type"] == "text"
+
+
+@pytest.mark.parametrize(
+    "n",
+    [
+        10_000,
+        100_000,
+        1_000_000,
+        pytest.param(
+            10_000_000,
+            marks=pytest.mark.skipif(
+                os.getenv("RUN_SLOW") != "1", reason="set RUN_SLOW=1 to run"
+            ),
+        ),
+    ],
+)
+@pytest.mark.parametrize(
+    "make_markdown, expected_parts",
+    [
+        (lambda n: "a" * n + "![x](http://example.com/x.png)" + "b" * n, 3),
+        # Unterminated markers are the worst case for a backtracking regex
+        (lambda n: "![" * (n // 2), 1),
+    ],
+    ids=["one-image", "unterminated"],
+)
+def test_split_images_is_linear(n, make_markdown, expected_parts):
+    """Test that splitting images stays within a size-proportional budget."""
+    markdown = make_markdown(n)
+    start = time.perf_counter()
+    parts = _split_images(markdown)
+    elapsed = time.perf_counter() - start
+    assert len(parts) == expected_parts
+    assert elapsed < 0.05 + n * 1e-6
@@ -0,0 +1,46 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+with patch("src.llms.llm.get_llm_by_type", return_value=MagicMock()):
+    from src.server.app import app
+
+from src.rag.retriever import Resource
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_rag_resources_without_retriever(client):
+    with patch("src.server.app.build_retriever", return_value=None):
+        response = client.get("/api/rag/resources", params={"query": "deer"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"resources": []}
+
+
+def test_rag_resources_with_retriever(client):
+    retriever = MagicMock()
+    retriever.list_resources.return_value = [
+        Resource(uri="rag://dataset/1", title="Deer", description="About deer"),
+        Resource(uri="rag://dataset/2", title="Flow"),
+    ]
+    with patch("src.server.app.build_retriever", return_value=retriever):
+        response = client.get("/api/rag/resources", params={"query": "deer"})
+
+    retriever.list_resources.assert_called_once_with("deer")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {
+        "resources": [
+            {"uri": "rag://dataset/1", "title": "Deer", "description": "About deer"},
+            {"uri": "rag://dataset/2", "title": "Flow", "description": ""},
+        ]
+    }
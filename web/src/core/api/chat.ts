@@ -50,6 +50,12 @@ export async function* chatStream(
     signal: options.abortSignal,
   });
   for await (const event of stream) {
+    if (event.event === "error") {
+      const { error } = JSON.parse(event.data) as {
+        error: { type: string; message: string };
+      };
+      throw new Error(error.message);
+    }
     yield {
       type: event.event,
       data: JSON.parse(event.data),